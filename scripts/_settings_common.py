@@ -0,0 +1,20 @@
+"""Helpers shared by settings_init.py, settings_add.py and settings_scan.py.
+
+Only the standard library is used here, so the settings scripts keep
+working without the image-generation dependencies.
+"""
+import os
+from typing import Union
+
+
+def _write_atomic(path: Union[str, "os.PathLike[str]"], data: bytes) -> None:
+    """Write bytes to path via a temp file and rename it into place."""
+    tmp = os.fspath(path) + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
@@ -0,0 +1,428 @@
+"""Helpers shared by generate_slide.py and generate_reference.py.
+
+Holds the pooled HTTP session, retry backoff, JSON/data-URI encoding and
+the reference-image resizing and reference-sheet building, so both
+scripts (and generate_deck.py, through generate_slide) share one
+connection pool and one set of caches.
+"""
+import base64
+import functools
+import io
+import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+except ImportError:
+    print("Error: requests not found. Install: pip install requests")
+    sys.exit(1)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: faster JSON encoding and response parsing
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    # Optional: only needed for reference images
+    Image = ImageDraw = ImageFont = None
+
+# One pooled session for all API calls and image downloads, so keep-alive
+# connections (and their TLS handshakes) are reused across requests and
+# across generate_deck.py worker threads. Connections are pooled per host,
+# so API calls and image-CDN downloads each keep their own warm pool.
+# Retrying is left to the callers' own backoff loops.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                       max_retries=Retry(total=0, read=False))
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+# Upper bound on threads decoding reference images for one sheet; character
+# and prop sheets commonly hold 8-16 references
+_DECODE_WORKERS = min(8, os.cpu_count() or 1)
+
+# Image URL in the model's reply: markdown ![...](url), else a bare URL
+_MD_IMG_RE = re.compile(r'!\[.*?\]\((https?://[^\s\)]+)\)')
+_BARE_URL_RE = re.compile(r'(https?://\S+\.(?:png|jpg|jpeg|webp|gif))',
+                          re.IGNORECASE)
+
+
+def _extract_image_url(text):
+    """Return the first image URL in a model reply, or None.
+
+    Prefers a markdown image ![...](url), else a bare image URL.
+    """
+    match = _MD_IMG_RE.search(text) or _BARE_URL_RE.search(text)
+    return match.group(1) if match else None
+
+
+# Client errors that retrying the identical request cannot fix
+_RETRYABLE_4XX = frozenset((408, 409, 425, 429))
+
+# Short pause before retrying a reply that had no image: the model's
+# output was the problem, not server load
+_NO_IMAGE_DELAY = 1.0
+
+
+def _is_retryable(status_code):
+    """False for 4xx errors (bad request, auth, ...) that will not recover."""
+    return not (400 <= status_code < 500) or status_code in _RETRYABLE_4XX
+
+
+def _backoff_for(response, attempt):
+    """Seconds to wait after failed attempt number `attempt` (1-based).
+
+    response is the failed HTTP response, or None for timeouts and other
+    transport errors. Exponential with jitter, starting around 0.5s and
+    capped at 30s. For 429/503 a numeric Retry-After header is honored
+    (clamped to 0-60s); without one, rate limits back off from a longer 2s
+    base.
+    """
+    base = 0.5
+    if response is not None and response.status_code in (429, 503):
+        try:
+            return max(0.0, min(60.0, float(response.headers["Retry-After"])))
+        except (KeyError, ValueError):
+            base = 2.0
+    return min(30.0, base * 2 ** (attempt - 1)) + random.uniform(0, 0.5)
+
+
+def _retry_wait(attempt, retries, response=None, delay=None):
+    """Sleep before the next attempt; nothing to wait for after the last.
+
+    delay overrides the computed backoff with a fixed number of seconds.
+    """
+    if attempt < retries:
+        if delay is None:
+            delay = _backoff_for(response, attempt)
+        time.sleep(delay)
+
+
+@functools.lru_cache(maxsize=64)
+def _ensure_dir(path):
+    """Create directory path once per process; later calls are no-ops."""
+    os.makedirs(path or ".", exist_ok=True)
+
+
+def _json_body(payload):
+    """Serialize a request payload to JSON bytes, with orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+def _json_response(response):
+    """Parse a response body as JSON, with orjson if installed."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _data_uri(data, mime):
+    """Build a base64 data URI from bytes or a BytesIO buffer.
+
+    A BytesIO is encoded through getbuffer() so its contents are not copied
+    first, and the URI is assembled as bytes and decoded to str once.
+    """
+    if isinstance(data, io.BytesIO):
+        with data.getbuffer() as view:
+            b64 = base64.b64encode(view)
+    else:
+        b64 = base64.b64encode(data)
+    prefix = b"data:" + mime.encode("ascii") + b";base64,"
+    return (prefix + b64).decode("ascii")
+
+
+def _encode_data_uri(img):
+    """Encode image as a base64 data URI.
+
+    JPEG (quality 85) keeps request payloads several times smaller than
+    PNG; PNG is only used when there is an alpha channel to preserve.
+    """
+    buf = io.BytesIO()
+    if img.mode in ("RGBA", "LA", "PA"):
+        img.save(buf, format="PNG")
+        mime = "image/png"
+    else:
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(buf, format="JPEG", quality=85, optimize=True)
+        mime = "image/jpeg"
+    return _data_uri(buf, mime)
+
+
+def _resize_image(img, max_size=512, resample=None):
+    """Resize image so longest side is max_size.
+
+    resample defaults to BILINEAR, which is plenty for reference thumbnails
+    the model only glances at; pass Image.LANCZOS where detail matters.
+    JPEGs that have not been decoded yet are first drafted by libjpeg to a
+    reduced DCT scale still covering the target. Large downscales use
+    reducing_gap, so a cheap box reduction runs before the resample filter.
+    """
+    w, h = img.size
+    if max(w, h) <= max_size:
+        return img
+    if w >= h:
+        new_w = max_size
+        new_h = int(h * max_size / w)
+    else:
+        new_h = max_size
+        new_w = int(w * max_size / h)
+    if resample is None:
+        resample = Image.BILINEAR
+    if img.format == "JPEG":
+        img.draft("RGB", (new_w, new_h))
+        dw, dh = img.size
+        if abs(dw - new_w) <= 1 and abs(dh - new_h) <= 1:
+            return img
+    return img.resize((new_w, new_h), resample, reducing_gap=3.0)
+
+
+def _flatten_for_resize(img):
+    """Convert alpha and palette images to RGB before resampling.
+
+    Resampling then runs over three channels instead of four, and palette
+    images are filtered properly (Pillow resizes "P" with NEAREST).
+    """
+    if img.mode in ("RGBA", "LA", "P", "PA"):
+        return img.convert("RGB")
+    return img
+
+
+def _decode_cell(path, size):
+    """Decode an image file scaled to fit size, as RGB, and close it."""
+    with Image.open(path) as img:
+        img = _flatten_for_resize(img)
+        img = _resize_image(img, size)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.load()
+    return img
+
+
+# Small opaque PNGs are sent as-is; larger ones are cheaper as JPEG
+_PNG_PASSTHROUGH_BYTES = 200_000
+
+
+def _passthrough_ok(img, path):
+    """True if an image already at target size can be sent as its file."""
+    if img.format == "JPEG":
+        return True
+    return (img.format == "PNG" and img.mode in ("RGB", "L")
+            and os.stat(path).st_size < _PNG_PASSTHROUGH_BYTES)
+
+
+def _image_to_base64(path, max_size=512, resample=None):
+    """Read image, resize, return base64 data URI."""
+    if Image is None:
+        raise RuntimeError("Pillow required for --reference-images. "
+                           "Install: pip install Pillow")
+    img = Image.open(path)
+    if max(img.size) <= max_size and _passthrough_ok(img, path):
+        # Already a small JPEG/PNG: ship the file bytes without re-encoding
+        mime = Image.MIME[img.format]
+        img.close()
+        with open(path, "rb") as f:
+            return _data_uri(f.read(), mime)
+    if img.mode == "RGBA":
+        img = img.convert("RGB")
+    img = _resize_image(img, max_size, resample)
+    return _encode_data_uri(img)
+
+
+def _bytes_to_base64_resized(raw, max_size=512, resample=None):
+    """Like _image_to_base64, for image bytes already in memory."""
+    if Image is None:
+        raise RuntimeError("Pillow required for quality check. "
+                           "Install: pip install Pillow")
+    img = Image.open(io.BytesIO(raw))
+    if img.format == "JPEG" and max(img.size) <= max_size:
+        return _data_uri(raw, "image/jpeg")
+    if img.mode == "RGBA":
+        img = img.convert("RGB")
+    img = _resize_image(img, max_size, resample)
+    return _encode_data_uri(img)
+
+
+def _concatenate_reference_images(paths, cell_size=256, max_cols=3,
+                                   labels=None):
+    """Concatenate multiple images into a single labeled reference sheet.
+
+    Arranges images in a grid so the model sees all references at once
+    instead of processing them as separate inputs (which can overwhelm it).
+    Each cell can have a label drawn at the top for identification.
+
+    Results are memoized on the paths, their modification times, labels
+    and layout, so a deck reusing the same references encodes them once.
+
+    Args:
+        paths: List of image file paths.
+        cell_size: Size of each grid cell in pixels.
+        max_cols: Maximum columns in the grid.
+        labels: Optional list of label strings, one per path.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow required for --reference-images. "
+                           "Install: pip install Pillow")
+    paths = tuple(paths)
+    mtimes = []
+    for p in paths:
+        try:
+            mtimes.append(os.stat(p).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return _concatenate_reference_images_cached(
+        paths, tuple(mtimes), tuple(labels or ()), cell_size, max_cols
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _concatenate_reference_images_cached(paths, mtimes, labels, cell_size,
+                                         max_cols):
+    entries = [
+        (p, labels[i] if i < len(labels) else None)
+        for i, (p, mtime) in enumerate(zip(paths, mtimes))
+        if mtime is not None
+    ]
+    if not entries:
+        return None
+
+    if len(entries) == 1:
+        # Single image — add label if present, then return
+        path, label = entries[0]
+        img = _decode_cell(path, cell_size)
+        if label:
+            draw = ImageDraw.Draw(img)
+            font, cjk_ok = _get_label_font(16)
+            _draw_label(draw, label, img.size[0], font,
+                        cjk_supported=cjk_ok)
+        return _encode_data_uri(img)
+
+    # Reserve space for label text at top of each cell, if any are labeled
+    label_h = 24 if any(label for _, label in entries) else 0
+    img_area = cell_size - label_h
+
+    # Calculate grid layout: top-left corner of every cell
+    n = len(entries)
+    cols = min(n, max_cols)
+    rows = (n + cols - 1) // cols
+    origins = [((i % cols) * cell_size, (i // cols) * cell_size)
+               for i in range(n)]
+
+    # Create canvas with white background
+    canvas_w = cols * cell_size
+    canvas_h = rows * cell_size
+    canvas = Image.new("RGB", (canvas_w, canvas_h), (255, 255, 255))
+    draw = ImageDraw.Draw(canvas)
+    font, cjk_ok = _get_label_font(14)
+
+    # Decode each source straight to cell size, closing it right away. With
+    # three or more references the decoding runs in a thread pool, one
+    # thread per reference up to _DECODE_WORKERS (Pillow releases the GIL
+    # while decoding); drawing stays on this thread.
+    cell_paths = [path for path, _ in entries]
+    if n >= 3 and _DECODE_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=min(_DECODE_WORKERS, n)) as pool:
+            cells = list(pool.map(_decode_cell, cell_paths, [img_area] * n))
+    else:
+        cells = [_decode_cell(path, img_area) for path in cell_paths]
+
+    # Paste each image centered in its cell, below its label
+    for (_, label), img, (cell_x, cell_y) in zip(entries, cells, origins):
+        if label:
+            _draw_label(draw, label, cell_size,
+                        font, cjk_supported=cjk_ok,
+                        offset_x=cell_x, offset_y=cell_y)
+
+        x = cell_x + (cell_size - img.size[0]) // 2
+        y = cell_y + label_h + (img_area - img.size[1]) // 2
+        canvas.paste(img, (x, y))
+
+    return _encode_data_uri(canvas)
+
+
+# Common CJK font paths on Linux/Mac/Windows, plus a user-local font
+_CJK_FONTS = (
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/System/Library/Fonts/STHeiti Light.ttc",
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    os.path.join(os.path.expanduser("~"), ".local/share/fonts/NotoSansSC.ttf"),
+)
+# Fallback: DejaVu or Ubuntu (no CJK support)
+_FALLBACK_FONTS = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/ubuntu/Ubuntu-R.ttf",
+)
+_FONT_CACHE = {}  # size -> (font, cjk_supported)
+
+
+def _get_label_font(size=14):
+    """Try to load a font that supports CJK characters.
+
+    The lookup runs once per size; later calls reuse the loaded font.
+    """
+    cached = _FONT_CACHE.get(size)
+    if cached is not None:
+        return cached
+    result = None
+    for paths, cjk_ok in ((_CJK_FONTS, True), (_FALLBACK_FONTS, False)):
+        for path in paths:
+            if os.path.exists(path):
+                try:
+                    result = ImageFont.truetype(path, size), cjk_ok
+                    break
+                except Exception:
+                    continue
+        if result is not None:
+            break
+    if result is None:
+        result = ImageFont.load_default(), False
+    _FONT_CACHE[size] = result
+    return result
+
+
+def _sanitize_label(text, cjk_supported):
+    """If CJK font not available, strip non-ASCII characters."""
+    if cjk_supported:
+        return text
+    # Keep ASCII and common punctuation, replace CJK with nothing
+    clean = ""
+    for ch in text:
+        if ord(ch) < 128:
+            clean += ch
+    return clean.strip() or text  # fallback to original if all stripped
+
+
+def _draw_label(draw, text, cell_width, font, cjk_supported=True,
+                offset_x=0, offset_y=0):
+    """Draw a centered label with dark background strip."""
+    text = _sanitize_label(text, cjk_supported)
+    bbox = draw.textbbox((0, 0), text, font=font)
+    tw = bbox[2] - bbox[0]
+    th = bbox[3] - bbox[1]
+    # Dark semi-transparent strip
+    strip_h = th + 6
+    draw.rectangle(
+        [offset_x, offset_y, offset_x + cell_width, offset_y + strip_h],
+        fill=(40, 40, 40),
+    )
+    # Centered white text
+    tx = offset_x + (cell_width - tw) // 2
+    ty = offset_y + 3
+    draw.text((tx, ty), text, fill=(255, 255, 255), font=font)
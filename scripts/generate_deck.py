@@ -4,7 +4,9 @@
 Reads slide_plan.json and settings/settings.json, generates all slides
 with reference images for visual consistency, and combines into PDF.
 
-Supports parallel generation via ThreadPoolExecutor.
+Supports parallel generation via ThreadPoolExecutor. Slide generation is
+network-bound (workers spend their time waiting on the API), so --workers
+can be raised well past the CPU count to keep more requests in flight.
 
 Usage:
     python generate_deck.py slide_plan.json
@@ -24,19 +26,60 @@ slide_plan.json format:
 }
 """
 import argparse
+import contextlib
+import functools
 import json
+import logging
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: faster parsing of plan/settings JSON
+
 # Import sibling modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from generate_slide import generate_slide
-from slides_to_pdf import combine_images_to_pdf
+from generate_slide import build_reference_sheet, generate_slide, review_slide
+from slides_to_pdf import PdfAppender
+
+log = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_json_cached(path, mtime_ns):
+    with open(path, "rb") as f:
+        data = f.read()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json(path):
+    """Load a JSON file, reusing the parsed result until its mtime changes.
+
+    The returned object is shared between callers and must not be mutated.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    return _load_json_cached(os.path.abspath(path), mtime_ns)
 
 
-def resolve_settings_images(settings_keys, settings, base_dir="."):
+def _path_exists(path, exists_cache=None):
+    """os.path.exists, memoized in exists_cache when one is given."""
+    if exists_cache is None:
+        return os.path.exists(path)
+    found = exists_cache.get(path)
+    if found is None:
+        found = exists_cache[path] = os.path.exists(path)
+    return found
+
+
+def resolve_settings_images(settings_keys, settings, base_dir=".",
+                            exists_cache=None):
     """Resolve setting keys like 'art_style', 'characters.hero' to image paths and labels."""
     images = []
     labels = []
@@ -49,7 +92,7 @@ def resolve_settings_images(settings_keys, settings, base_dir="."):
             label = f"Art Style: {desc[:30]}" if desc else "Art Style"
             for p in settings.get("art_style", {}).get("images", []):
                 full = os.path.join(base_dir, p)
-                if os.path.exists(full):
+                if _path_exists(full, exists_cache):
                     images.append(full)
                     labels.append(label)
         elif len(parts) == 2:
@@ -59,7 +102,7 @@ def resolve_settings_images(settings_keys, settings, base_dir="."):
             label = f"{name}: {desc[:30]}" if desc else name
             for p in entry.get("images", []):
                 full = os.path.join(base_dir, p)
-                if os.path.exists(full):
+                if _path_exists(full, exists_cache):
                     images.append(full)
                     labels.append(label)
         else:
@@ -71,7 +114,7 @@ def resolve_settings_images(settings_keys, settings, base_dir="."):
                     label = f"{name}: {desc[:30]}" if desc else name
                     for p in entry.get("images", []):
                         full = os.path.join(base_dir, p)
-                        if os.path.exists(full):
+                        if _path_exists(full, exists_cache):
                             images.append(full)
                             labels.append(label)
     return images, labels
@@ -97,46 +140,186 @@ def resolve_settings_descriptions(settings_keys, settings):
     return " ".join(descs)
 
 
-def generate_one_slide(slide_info, style_prefix, settings,
-                       slides_dir, base_dir, quality_check=False):
-    """Generate a single slide with settings context."""
-    filename = slide_info["filename"]
-    prompt = slide_info["prompt"]
-    settings_keys = slide_info.get("settings", ["art_style"])
-    output = os.path.join(slides_dir, filename)
-
-    # Build full prompt with style prefix and settings descriptions
-    desc_text = resolve_settings_descriptions(settings_keys, settings)
-    full_prompt = ""
-    if style_prefix:
-        full_prompt += style_prefix + " "
-    if desc_text:
-        full_prompt += desc_text + " "
-    full_prompt += prompt
-
-    # Resolve reference images and labels
-    ref_images, ref_labels = resolve_settings_images(
-        settings_keys, settings, base_dir
-    )
+def _slide_ready(path):
+    """True if a generated slide image exists and is not a stub."""
+    try:
+        return os.stat(path).st_size > 1000
+    except FileNotFoundError:
+        return False
 
-    print(f"\n[{filename}] Generating...")
-    if ref_images:
-        print(f"  Reference images: {len(ref_images)} (concatenated)")
 
-    ok = generate_slide(
-        full_prompt, output, retries=3,
-        reference_images=ref_images if ref_images else None,
-        reference_labels=ref_labels if ref_labels else None,
-        quality_check=quality_check,
+def resolve_settings(settings_keys, settings, base_dir=".",
+                     exists_cache=None):
+    """Resolve setting keys to (images, labels, description text)."""
+    images, labels = resolve_settings_images(
+        settings_keys, settings, base_dir, exists_cache
     )
-    return filename, ok
+    desc_text = resolve_settings_descriptions(settings_keys, settings)
+    return images, labels, desc_text
+
+
+# One validated plan entry with everything a worker needs precomputed
+SlideJob = namedtuple(
+    "SlideJob",
+    "filename prompt settings_keys full_prompt ref_images ref_sheet error",
+)
+
+
+class _ReferenceSheet:
+    """Reference sheet for one settings combination, built on first use.
+
+    Slides sharing the combination share one instance, so the sheet is
+    encoded once per deck, and only if a slide actually needs generating.
+    A build error (e.g. an unreadable image) is kept and re-raised for
+    every slide using the combination, so only those slides fail.
+    """
+
+    def __init__(self, images, labels):
+        self.images = images
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._done = False
+        self._uri = None
+        self._error = None
+
+    def get(self):
+        """Return the sheet's data URI (None if no image exists)."""
+        with self._lock:
+            if not self._done:
+                try:
+                    self._uri = build_reference_sheet(self.images,
+                                                      self.labels)
+                except Exception as e:
+                    self._error = e
+                self._done = True
+        if self._error is not None:
+            raise self._error
+        return self._uri
+
+
+def validate_slides(slides):
+    """Check every plan entry up front.
+
+    Raises ValueError listing all offending entries: missing or non-string
+    filename/prompt, a settings value that is not a list of non-empty
+    strings, or duplicate filenames.
+    """
+    problems = []
+    seen = set()
+    for i, slide_info in enumerate(slides, 1):
+        if not isinstance(slide_info, dict):
+            problems.append(f"slide {i}: not an object")
+            continue
+        for field in ("filename", "prompt"):
+            value = slide_info.get(field)
+            if not isinstance(value, str) or not value:
+                problems.append(f"slide {i}: missing '{field}'")
+        settings_keys = slide_info.get("settings", [])
+        if not isinstance(settings_keys, list):
+            problems.append(f"slide {i}: 'settings' must be a list")
+        else:
+            for key in settings_keys:
+                if not isinstance(key, str) or not key:
+                    problems.append(f"slide {i}: invalid settings key "
+                                    f"{key!r}; expected a non-empty string")
+        filename = slide_info.get("filename")
+        if isinstance(filename, str) and filename:
+            if filename in seen:
+                problems.append(f"slide {i}: duplicate filename '{filename}'")
+            seen.add(filename)
+    if problems:
+        raise ValueError("Invalid slide plan:\n  " + "\n  ".join(problems))
+
+
+def build_slide_jobs(slides, style_prefix, settings, base_dir="."):
+    """Validate the plan and precompute a SlideJob per slide.
+
+    Each distinct settings combination is resolved once rather than once
+    per slide, and shares one lazily built _ReferenceSheet. If resolving a
+    combination fails (malformed settings.json data), the error is kept
+    on its jobs and raised by generate_one_slide(), so only those slides
+    fail.
+    """
+    validate_slides(slides)
+
+    exists_cache = {}
+    resolved_cache = {}
+    jobs = []
+    for slide_info in slides:
+        key = tuple(slide_info.get("settings", ["art_style"]))
+        if key not in resolved_cache:
+            try:
+                images, labels, desc_text = resolve_settings(
+                    key, settings, base_dir, exists_cache
+                )
+            except Exception as e:
+                error = ValueError(f"cannot resolve settings {list(key)}: {e}")
+                resolved_cache[key] = ([], "", None, error)
+            else:
+                sheet = _ReferenceSheet(images, labels) if images else None
+                resolved_cache[key] = (images, desc_text, sheet, None)
+        ref_images, desc_text, ref_sheet, error = resolved_cache[key]
+
+        # Build full prompt with style prefix and settings descriptions
+        full_prompt = ""
+        if style_prefix:
+            full_prompt += style_prefix + " "
+        if desc_text:
+            full_prompt += desc_text + " "
+        full_prompt += slide_info["prompt"]
+
+        jobs.append(SlideJob(
+            slide_info["filename"], slide_info["prompt"], key,
+            full_prompt, ref_images, ref_sheet, error,
+        ))
+    return jobs
+
+
+def generate_one_slide(job, slides_dir, api_slots=None):
+    """Generate a single slide from a SlideJob.
+
+    api_slots: Optional semaphore held around the API calls, shared with
+        review_one_slide() to cap the requests in flight.
+
+    Returns (filename, ok, fresh); fresh is False when an existing image
+    was kept, so there is nothing new to quality-check.
+    """
+    if job.error is not None:
+        raise job.error
+    output = os.path.join(slides_dir, job.filename)
+    fresh = not _slide_ready(output)
+
+    log.info("[%s] Generating...", job.filename)
+    # An existing slide is skipped by generate_slide, so its references
+    # are never decoded
+    ref_data_uri = None
+    if fresh and job.ref_sheet is not None:
+        log.info("  Reference images: %d (concatenated)", len(job.ref_images))
+        ref_data_uri = job.ref_sheet.get()
+
+    with (api_slots if fresh and api_slots else contextlib.nullcontext()):
+        ok = generate_slide(
+            job.full_prompt, output, retries=3,
+            reference_data_uri=ref_data_uri,
+        )
+    return job.filename, ok, fresh
+
+
+def review_one_slide(job, slides_dir, api_slots=None):
+    """Quality-check (and if needed refine) a freshly generated slide."""
+    output = os.path.join(slides_dir, job.filename)
+    ref_data_uri = job.ref_sheet.get() if job.ref_sheet else None
+    with (api_slots or contextlib.nullcontext()):
+        log.info("[%s] Quality check...", job.filename)
+        return review_slide(
+            job.full_prompt, output, reference_data_uri=ref_data_uri,
+        )
 
 
 def run_deck(plan_path, output_pdf=None, slides_dir=None,
              workers=3, base_dir=None, quality_check=False):
     """Run the full deck generation pipeline."""
-    with open(plan_path) as f:
-        plan = json.load(f)
+    plan = load_json(plan_path)
 
     if base_dir is None:
         base_dir = os.path.dirname(os.path.abspath(plan_path))
@@ -145,80 +328,125 @@ def run_deck(plan_path, output_pdf=None, slides_dir=None,
             base_dir = "."
 
     settings_file = os.path.join(base_dir, "settings", "settings.json")
-    if os.path.exists(settings_file):
-        with open(settings_file) as f:
-            settings = json.load(f)
-        print(f"Loaded settings from {settings_file}")
-    else:
+    try:
+        settings = load_json(settings_file)
+        log.info("Loaded settings from %s", settings_file)
+    except FileNotFoundError:
         settings = {}
-        print("No settings.json found, proceeding without settings")
+        log.info("No settings.json found, proceeding without settings")
 
     style_prefix = plan.get("style_prefix", "")
     slides = plan.get("slides", [])
 
     if not slides:
-        print("Error: No slides in plan")
+        log.error("Error: No slides in plan")
+        return False
+
+    try:
+        jobs = build_slide_jobs(slides, style_prefix, settings, base_dir)
+    except ValueError as e:
+        log.error("Error: %s", e)
         return False
 
     if slides_dir is None:
         slides_dir = os.path.join(base_dir, "slides")
-    os.makedirs(slides_dir, exist_ok=True)
-
     if output_pdf is None:
         output_pdf = os.path.join(base_dir, "output", "presentation.pdf")
-    os.makedirs(os.path.dirname(output_pdf) or ".", exist_ok=True)
 
-    print(f"Generating {len(slides)} slides (workers={workers})...")
-
-    # Generate slides in parallel
+    # Create every output directory once, up front, rather than per slide
+    out_dirs = {os.path.dirname(os.path.join(slides_dir, job.filename))
+                for job in jobs}
+    out_dirs.add(os.path.dirname(output_pdf) or ".")
+    for d in out_dirs:
+        Path(d).mkdir(parents=True, exist_ok=True)
+
+    # No point starting more threads than there are slides
+    workers = max(1, min(workers, len(slides)))
+    log.info("Generating %d slides (workers=%d)...", len(slides), workers)
+
+    # Generate slides in parallel. With quality checks on, each freshly
+    # generated slide is handed to a separate review pool, so its QC and
+    # refine calls overlap with the generation of later slides instead of
+    # holding a generation worker. Both stages draw on one api_slots
+    # budget, so at most `workers` API requests are in flight overall.
+    # As slides are finished they are handed, in plan order, to a single
+    # PDF-writer thread, so the PDF is built while later slides are still
+    # in progress.
+    appender = PdfAppender(Path(output_pdf), dpi=150,
+                           verbose=log.isEnabledFor(logging.INFO))
+    log.info("Writing PDF pages as slides complete: %s", output_pdf)
     results = {}
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {}
-        for slide_info in slides:
-            future = executor.submit(
-                generate_one_slide, slide_info, style_prefix,
-                settings, slides_dir, base_dir, quality_check,
-            )
-            futures[future] = slide_info["filename"]
-
-        for future in as_completed(futures):
-            filename = futures[future]
-            try:
-                fname, ok = future.result()
-                results[fname] = ok
-                status = "OK" if ok else "FAILED"
-                print(f"  [{fname}] {status}")
-            except Exception as e:
-                results[filename] = False
-                print(f"  [{filename}] ERROR: {e}")
+    finished = {}  # plan index -> finished, until its page is released
+    next_index = 0
+    page_futures = []
+    api_slots = threading.BoundedSemaphore(workers)
+    with ThreadPoolExecutor(max_workers=1,
+                            thread_name_prefix="pdf") as pdf_writer, \
+            ThreadPoolExecutor(max_workers=workers,
+                               thread_name_prefix="review") as reviewer, \
+            ThreadPoolExecutor(max_workers=workers,
+                               thread_name_prefix="generate") as executor:
+        pending = {}  # future -> (plan index, stage)
+        for index, job in enumerate(jobs):
+            future = executor.submit(generate_one_slide, job, slides_dir,
+                                     api_slots)
+            pending[future] = (index, "generate")
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, stage = pending.pop(future)
+                filename = jobs[index].filename
+                if stage == "generate":
+                    try:
+                        fname, ok, fresh = future.result()
+                        results[fname] = ok
+                        status = "OK" if ok else "FAILED"
+                        log.info("  [%s] %s", fname, status)
+                    except Exception as e:
+                        results[filename] = False
+                        log.error("  [%s] ERROR: %s", filename, e)
+                    else:
+                        if quality_check and ok and fresh:
+                            review = reviewer.submit(
+                                review_one_slide, jobs[index], slides_dir,
+                                api_slots,
+                            )
+                            pending[review] = (index, "review")
+                            continue
+                else:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # The generated image is still usable
+                        log.warning("  [%s] QC ERROR: %s", filename, e)
+
+                # Release every slide up to the first one still in flight
+                finished[index] = True
+                while finished.pop(next_index, False):
+                    path = os.path.join(slides_dir, jobs[next_index].filename)
+                    if _slide_ready(path):
+                        page_futures.append(
+                            pdf_writer.submit(appender.add, Path(path))
+                        )
+                    next_index += 1
 
     # Report
     succeeded = sum(1 for v in results.values() if v)
     failed = sum(1 for v in results.values() if not v)
-    print(f"\nGeneration complete: {succeeded} OK, {failed} failed")
+    log.info("Generation complete: %d OK, %d failed", succeeded, failed)
 
     if failed > 0:
-        print("Warning: Some slides failed. PDF will be created with "
-              "available slides only.")
+        log.warning("Warning: Some slides failed. PDF will be created with "
+                    "available slides only.")
 
-    # Collect generated slide files in order
-    slide_files = []
-    for slide_info in slides:
-        path = Path(os.path.join(slides_dir, slide_info["filename"]))
-        if path.exists() and path.stat().st_size > 1000:
-            slide_files.append(path)
-
-    if not slide_files:
-        print("Error: No slide images available for PDF")
+    if not page_futures:
+        log.error("Error: No slide images available for PDF")
         return False
 
-    # Combine into PDF
-    print(f"\nCombining {len(slide_files)} slides into PDF...")
-    ok = combine_images_to_pdf(
-        slide_files, Path(output_pdf), dpi=150, verbose=True
-    )
+    ok = appender.close()
     if ok:
-        print(f"\nDeck complete: {output_pdf}")
+        log.info("Deck complete: %s", output_pdf)
     return ok
 
 
@@ -232,12 +460,22 @@ def main():
     parser.add_argument("--slides-dir", default=None,
                         help="Directory for slide images (default: slides/)")
     parser.add_argument("--workers", "-w", type=int, default=3,
-                        help="Parallel workers (default: 3)")
+                        help="Max API requests in flight, shared by "
+                             "generation and quality checks; requests are "
+                             "I/O-bound, so this can exceed the CPU count "
+                             "(default: 3)")
     parser.add_argument("--base-dir", default=None,
                         help="Base directory (default: plan file's directory)")
     parser.add_argument("--quality-check", "-q", action="store_true",
                         help="Enable quality check and auto-refinement")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Only report warnings and errors")
     args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO,
+        format="%(asctime)s [%(threadName)s] %(message)s",
+        datefmt="%H:%M:%S", stream=sys.stdout,
+    )
 
     ok = run_deck(
         args.plan, output_pdf=args.output,
@@ -22,14 +22,15 @@ Usage:
 Options:
     --max-size N    Max dimension for saved image (default: 512)
     --retries N     Max retry attempts (default: 3)
+    --reference-mode collage|multipart
+                    Send references as one sheet or separately
+                    (default: collage)
+    --quiet         Only report warnings and errors
 """
 import argparse
-import base64
-import io
+import logging
 import os
-import re
 import sys
-import time
 
 try:
     import requests
@@ -43,79 +44,69 @@ except ImportError:
     print("Error: Pillow not found. Install: pip install Pillow")
     sys.exit(1)
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _slide_common import (
+    _NO_IMAGE_DELAY,
+    _SESSION,
+    _concatenate_reference_images,
+    _ensure_dir,
+    _extract_image_url,
+    _image_to_base64,
+    _is_retryable,
+    _json_body,
+    _json_response,
+    _resize_image,
+    _retry_wait,
+)
+
+__all__ = [
+    "REFERENCE_MODES",
+    "concatenate_reference_images",
+    "generate_reference",
+    "image_to_base64",
+    "resize_image",
+]
+
+log = logging.getLogger(__name__)
+
+REFERENCE_MODES = ("collage", "multipart")
+
 
 def resize_image(img, max_size=512):
-    """Resize image so longest side is max_size."""
-    w, h = img.size
-    if max(w, h) <= max_size:
-        return img
-    if w >= h:
-        new_w = max_size
-        new_h = int(h * max_size / w)
-    else:
-        new_h = max_size
-        new_w = int(w * max_size / h)
-    return img.resize((new_w, new_h), Image.LANCZOS)
+    """Resize image so longest side is max_size, with LANCZOS.
+
+    Undecoded JPEGs are drafted by libjpeg to a reduced scale first.
+    """
+    return _resize_image(img, max_size, Image.LANCZOS)
 
 
 def image_to_base64(path, max_size=512):
     """Read image, resize, return base64 data URI."""
-    img = Image.open(path)
-    img = resize_image(img, max_size)
-    if img.mode == "RGBA":
-        img = img.convert("RGB")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    b64 = base64.b64encode(buf.getvalue()).decode()
-    return f"data:image/png;base64,{b64}"
+    return _image_to_base64(path, max_size)
 
 
 def concatenate_reference_images(paths, cell_size=256, max_cols=3):
-    """Concatenate multiple images into a single reference sheet."""
-    imgs = []
-    for p in paths:
-        if not os.path.exists(p):
-            continue
-        img = Image.open(p)
-        if img.mode == "RGBA":
-            img = img.convert("RGB")
-        img = resize_image(img, cell_size)
-        imgs.append(img)
-
-    if not imgs:
-        return None
-    if len(imgs) == 1:
-        buf = io.BytesIO()
-        imgs[0].save(buf, format="PNG")
-        b64 = base64.b64encode(buf.getvalue()).decode()
-        return f"data:image/png;base64,{b64}"
-
-    n = len(imgs)
-    cols = min(n, max_cols)
-    rows = (n + cols - 1) // cols
-    canvas_w = cols * cell_size
-    canvas_h = rows * cell_size
-    canvas = Image.new("RGB", (canvas_w, canvas_h), (255, 255, 255))
-
-    for i, img in enumerate(imgs):
-        row = i // cols
-        col = i % cols
-        x = col * cell_size + (cell_size - img.size[0]) // 2
-        y = row * cell_size + (cell_size - img.size[1]) // 2
-        canvas.paste(img, (x, y))
-
-    buf = io.BytesIO()
-    canvas.save(buf, format="PNG")
-    b64 = base64.b64encode(buf.getvalue()).decode()
-    return f"data:image/png;base64,{b64}"
+    """Concatenate multiple images into a single reference sheet.
+
+    Missing paths are skipped; returns None if none exist.
+    """
+    return _concatenate_reference_images(paths, cell_size, max_cols)
 
 
 def generate_reference(prompt, output, reference_images=None,
-                       max_size=512, retries=3):
-    """Generate a reference image and save to output path."""
+                       max_size=512, retries=3, mode="collage"):
+    """Generate a reference image and save to output path.
+
+    mode: How reference_images are sent. "collage" (default) combines
+        them into one sheet, which keeps the payload small when there are
+        many; "multipart" sends each image as its own message part.
+    """
+    if mode not in REFERENCE_MODES:
+        raise ValueError(f"Unknown reference mode: {mode!r}")
+
     api_key = os.getenv("ANTHROPIC_AUTH_TOKEN")
     if not api_key:
-        print("Error: No API key. Set ANTHROPIC_AUTH_TOKEN.")
+        log.error("Error: No API key. Set ANTHROPIC_AUTH_TOKEN.")
         return False
 
     base_url = os.getenv("LUCKYAPI_BASE_URL", "https://luckyapi.chat/v1")
@@ -128,18 +119,24 @@ def generate_reference(prompt, output, reference_images=None,
         "Content-Type": "application/json",
     }
 
-    # Build content: concatenated reference sheet + text prompt
+    # Build content: reference image(s) + text prompt
+    ref_uris = []
     if reference_images:
-        ref_data_uri = concatenate_reference_images(
-            reference_images, cell_size=max_size
-        )
-        if ref_data_uri:
-            msg_content = [
-                {"type": "image_url", "image_url": {"url": ref_data_uri}},
-                {"type": "text", "text": prompt},
-            ]
+        if mode == "collage":
+            ref_data_uri = concatenate_reference_images(
+                reference_images, cell_size=max_size
+            )
+            if ref_data_uri:
+                ref_uris.append(ref_data_uri)
         else:
-            msg_content = prompt
+            ref_uris = [image_to_base64(p, max_size)
+                        for p in reference_images if os.path.exists(p)]
+    if ref_uris:
+        msg_content = [
+            {"type": "image_url", "image_url": {"url": uri}}
+            for uri in ref_uris
+        ]
+        msg_content.append({"type": "text", "text": prompt})
     else:
         msg_content = prompt
 
@@ -149,60 +146,71 @@ def generate_reference(prompt, output, reference_images=None,
         "modalities": ["image", "text"],
     }
 
-    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    # Serialized once; the same body is re-sent on every retry
+    body = _json_body(payload)
+
+    _ensure_dir(os.path.dirname(output))
 
     for attempt in range(1, retries + 1):
         try:
-            print(f"  Attempt {attempt}/{retries}...")
-            r = requests.post(url, headers=headers, json=payload,
+            log.info("  Attempt %d/%d...", attempt, retries)
+            r = _SESSION.post(url, headers=headers, data=body,
                               timeout=300)
             if r.status_code != 200:
-                print(f"  HTTP {r.status_code}, retrying...")
-                time.sleep(5)
+                if not _is_retryable(r.status_code):
+                    log.error("  HTTP %d, not retrying: %s",
+                              r.status_code, r.text[:200])
+                    return False
+                log.warning("  HTTP %d, retrying...", r.status_code)
+                _retry_wait(attempt, retries, r)
                 continue
 
-            resp = r.json()
+            resp = _json_response(r)
             msg = resp.get("choices", [{}])[0].get("message", {})
             text = msg.get("content", "")
 
-            # Extract image URL
-            url_match = re.search(
-                r'!\[.*?\]\((https?://[^\s\)]+)\)', text
-            )
-            if not url_match:
-                url_match = re.search(
-                    r'(https?://\S+\.(?:png|jpg|jpeg|webp|gif))',
-                    text, re.IGNORECASE,
-                )
-            if not url_match:
-                print(f"  No image URL in response, retrying...")
-                time.sleep(3)
-                continue
-
-            img_url = url_match.group(1)
-            img_resp = requests.get(img_url, timeout=60)
-            if img_resp.status_code != 200 or len(img_resp.content) < 1000:
-                print(f"  Download failed: HTTP {img_resp.status_code}")
-                time.sleep(3)
+            img_url = _extract_image_url(text)
+            if not img_url:
+                log.warning("  No image URL in response, retrying...")
+                _retry_wait(attempt, retries, delay=_NO_IMAGE_DELAY)
                 continue
 
-            # Resize and save
-            img = Image.open(io.BytesIO(img_resp.content))
-            img = resize_image(img, max_size)
-            if img.mode == "RGBA":
-                img = img.convert("RGB")
-            img.save(output, format="PNG")
-            print(f"  OK -> {output} ({img.size[0]}x{img.size[1]})")
+            with _SESSION.get(img_url, timeout=60, stream=True) as img_resp:
+                length = img_resp.headers.get("Content-Length")
+                if (img_resp.status_code != 200
+                        or (length is not None and int(length) < 1000)):
+                    log.warning("  Download failed: HTTP %d",
+                                img_resp.status_code)
+                    _retry_wait(attempt, retries)
+                    continue
+
+                # Decode from the response stream, resize and save
+                img_resp.raw.decode_content = True
+                img = Image.open(img_resp.raw)
+                if img.mode == "RGBA":
+                    img = img.convert("RGB")
+                img = resize_image(img, max_size)
+                # Written beside output and renamed in, so a failed save
+                # never leaves a truncated image behind
+                part = output + ".part"
+                try:
+                    img.save(part, format="PNG")
+                except BaseException:
+                    if os.path.exists(part):
+                        os.remove(part)
+                    raise
+                os.replace(part, output)
+            log.info("  OK -> %s (%dx%d)", output, img.size[0], img.size[1])
             return True
 
         except requests.exceptions.Timeout:
-            print(f"  Timeout, retrying...")
-            time.sleep(5)
+            log.warning("  Timeout, retrying...")
+            _retry_wait(attempt, retries)
         except Exception as e:
-            print(f"  Error: {e}")
-            time.sleep(3)
+            log.warning("  Error: %s", e)
+            _retry_wait(attempt, retries)
 
-    print(f"  FAILED after {retries} attempts")
+    log.error("  FAILED after %d attempts", retries)
     return False
 
 
@@ -219,13 +227,22 @@ def main():
                         help="Max dimension for saved image (default: 512)")
     parser.add_argument("--retries", type=int, default=3,
                         help="Max retries (default: 3)")
+    parser.add_argument("--reference-mode", choices=REFERENCE_MODES,
+                        default="collage",
+                        help="Send references as one collage or as "
+                             "separate images (default: collage)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Only report warnings and errors")
     args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format="%(message)s", stream=sys.stdout)
 
     ok = generate_reference(
         args.prompt, args.output,
         reference_images=args.reference_images,
         max_size=args.max_size,
         retries=args.retries,
+        mode=args.reference_mode,
     )
     sys.exit(0 if ok else 1)
 
@@ -18,12 +18,12 @@ Environment:
     LUCKYAPI_MODEL         Model name (default: (按次)gemini-3-pro-image-preview)
 """
 import argparse
-import base64
 import io
+import logging
 import os
-import re
+import shutil
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     import requests
@@ -31,208 +31,64 @@ except ImportError:
     print("Error: requests not found. Install: pip install requests")
     sys.exit(1)
 
-try:
-    from PIL import Image
-except ImportError:
-    Image = None  # Optional: only needed for --reference-images
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _slide_common import (
+    Image,
+    _NO_IMAGE_DELAY,
+    _SESSION,
+    _bytes_to_base64_resized,
+    _concatenate_reference_images,
+    _ensure_dir,
+    _extract_image_url,
+    _is_retryable,
+    _json_body,
+    _json_response,
+    _retry_wait,
+)
 
+log = logging.getLogger(__name__)
 
-def _resize_image(img, max_size=512):
-    """Resize image so longest side is max_size."""
-    w, h = img.size
-    if max(w, h) <= max_size:
-        return img
-    if w >= h:
-        new_w = max_size
-        new_h = int(h * max_size / w)
-    else:
-        new_h = max_size
-        new_w = int(w * max_size / h)
-    return img.resize((new_w, new_h), Image.LANCZOS)
-
-
-def _image_to_base64(path, max_size=512):
-    """Read image, resize, return base64 data URI."""
-    if Image is None:
-        raise RuntimeError("Pillow required for --reference-images. "
-                           "Install: pip install Pillow")
-    img = Image.open(path)
-    img = _resize_image(img, max_size)
-    if img.mode == "RGBA":
-        img = img.convert("RGB")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    b64 = base64.b64encode(buf.getvalue()).decode()
-    return f"data:image/png;base64,{b64}"
-
-
-def _concatenate_reference_images(paths, cell_size=256, max_cols=3,
-                                   labels=None):
-    """Concatenate multiple images into a single labeled reference sheet.
-
-    Arranges images in a grid so the model sees all references at once
-    instead of processing them as separate inputs (which can overwhelm it).
-    Each cell can have a label drawn at the top for identification.
-
-    Args:
-        paths: List of image file paths.
-        cell_size: Size of each grid cell in pixels.
-        max_cols: Maximum columns in the grid.
-        labels: Optional list of label strings, one per path.
-    """
-    if Image is None:
-        raise RuntimeError("Pillow required for --reference-images. "
-                           "Install: pip install Pillow")
-    from PIL import ImageDraw, ImageFont
-
-    imgs = []
-    valid_labels = []
-    for i, p in enumerate(paths):
-        if not os.path.exists(p):
-            continue
-        img = Image.open(p)
-        if img.mode == "RGBA":
-            img = img.convert("RGB")
-        imgs.append(img)
-        if labels and i < len(labels):
-            valid_labels.append(labels[i])
-        else:
-            valid_labels.append(None)
 
-    if not imgs:
-        return None
+# Reference-sheet cells are never shrunk below this, to keep labels legible
+_MIN_SHEET_CELL = 128
 
-    if len(imgs) == 1:
-        # Single image — add label if present, then return
-        img = _resize_image(imgs[0], cell_size)
-        if valid_labels[0]:
-            draw = ImageDraw.Draw(img)
-            font, cjk_ok = _get_label_font(16)
-            _draw_label(draw, valid_labels[0], img.size[0], font,
-                        cjk_supported=cjk_ok)
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        b64 = base64.b64encode(buf.getvalue()).decode()
-        return f"data:image/png;base64,{b64}"
-
-    # Reserve space for label text at top of each cell
-    label_h = 24
-    img_area = cell_size - label_h
-
-    # Calculate grid layout
-    n = len(imgs)
-    cols = min(n, max_cols)
-    rows = (n + cols - 1) // cols
-
-    # Create canvas with white background
-    canvas_w = cols * cell_size
-    canvas_h = rows * cell_size
-    canvas = Image.new("RGB", (canvas_w, canvas_h), (255, 255, 255))
-    draw = ImageDraw.Draw(canvas)
-    font, cjk_ok = _get_label_font(14)
-
-    # Paste each image centered in its cell, with label
-    for i, img in enumerate(imgs):
-        row = i // cols
-        col = i % cols
-        cell_x = col * cell_size
-        cell_y = row * cell_size
-
-        # Draw label at top of cell
-        if valid_labels[i]:
-            _draw_label(draw, valid_labels[i], cell_size,
-                        font, cjk_supported=cjk_ok,
-                        offset_x=cell_x, offset_y=cell_y)
-
-        # Resize image to fit below label
-        img = _resize_image(img, img_area)
-        x = cell_x + (cell_size - img.size[0]) // 2
-        y = cell_y + label_h + (img_area - img.size[1]) // 2
-        canvas.paste(img, (x, y))
-
-    buf = io.BytesIO()
-    canvas.save(buf, format="PNG")
-    b64 = base64.b64encode(buf.getvalue()).decode()
-    return f"data:image/png;base64,{b64}"
-
-
-def _get_label_font(size=14):
-    """Try to load a font that supports CJK characters."""
-    from PIL import ImageFont
-    # Common CJK font paths on Linux/Mac/Windows
-    cjk_fonts = [
-        "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-        "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-        "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
-        "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
-        "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
-        "/System/Library/Fonts/PingFang.ttc",
-        "/System/Library/Fonts/STHeiti Light.ttc",
-        "C:/Windows/Fonts/msyh.ttc",
-        "C:/Windows/Fonts/simhei.ttf",
-    ]
-    # Also check user-local fonts
-    import os.path
-    home = os.path.expanduser("~")
-    cjk_fonts.append(os.path.join(home, ".local/share/fonts/NotoSansSC.ttf"))
-
-    for path in cjk_fonts:
-        if os.path.exists(path):
-            try:
-                return ImageFont.truetype(path, size), True
-            except Exception:
-                continue
-    # Fallback: use DejaVu or default (no CJK support)
-    fallback_fonts = [
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-        "/usr/share/fonts/truetype/ubuntu/Ubuntu-R.ttf",
-    ]
-    for path in fallback_fonts:
-        if os.path.exists(path):
-            try:
-                return ImageFont.truetype(path, size), False
-            except Exception:
-                continue
-    return ImageFont.load_default(), False
-
-
-def _sanitize_label(text, cjk_supported):
-    """If CJK font not available, strip non-ASCII characters."""
-    if cjk_supported:
-        return text
-    # Keep ASCII and common punctuation, replace CJK with nothing
-    clean = ""
-    for ch in text:
-        if ord(ch) < 128:
-            clean += ch
-    return clean.strip() or text  # fallback to original if all stripped
-
-
-def _draw_label(draw, text, cell_width, font, cjk_supported=True,
-                offset_x=0, offset_y=0):
-    """Draw a centered label with dark background strip."""
-    text = _sanitize_label(text, cjk_supported)
-    bbox = draw.textbbox((0, 0), text, font=font)
-    tw = bbox[2] - bbox[0]
-    th = bbox[3] - bbox[1]
-    # Dark semi-transparent strip
-    strip_h = th + 6
-    draw.rectangle(
-        [offset_x, offset_y, offset_x + cell_width, offset_y + strip_h],
-        fill=(40, 40, 40),
-    )
-    # Centered white text
-    tx = offset_x + (cell_width - tw) // 2
-    ty = offset_y + 3
-    draw.text((tx, ty), text, fill=(255, 255, 255), font=font)
 
+def build_reference_sheet(reference_images, reference_labels=None,
+                          max_sheet_kb=512):
+    """Build the labeled reference sheet data URI sent with a slide request.
 
-def _quality_check(image_path, prompt, api_key, base_url, model):
+    The sheet rides along on every generate and refine request, so if its
+    encoded image exceeds max_sheet_kb the cells are halved (down to
+    _MIN_SHEET_CELL px) until it fits. Pass None to disable the limit.
+
+    Returns None if none of the reference images exist. Callers generating
+    many slides with the same references can build the sheet once and pass
+    it to generate_slide() as reference_data_uri.
+    """
+    cell_size = 256
+    while True:
+        uri = _concatenate_reference_images(
+            reference_images, cell_size=cell_size, labels=reference_labels
+        )
+        if uri is None or max_sheet_kb is None:
+            return uri
+        # Decoded image size from the base64 payload length
+        size_kb = (len(uri) - uri.index(",") - 1) * 3 // 4 // 1024
+        if size_kb <= max_sheet_kb or cell_size // 2 < _MIN_SHEET_CELL:
+            return uri
+        log.info("  Reference sheet is %d KB (limit %d KB), "
+                 "shrinking cells to %d px", size_kb, max_sheet_kb,
+                 cell_size // 2)
+        cell_size //= 2
+
+
+def _quality_check(data_uri, prompt, api_key, base_url, model):
     """Send generated image to the model for quality evaluation.
 
+    data_uri: The image as built by _bytes_to_base64_resized().
+
     Returns (passed: bool, reason: str).
     """
-    data_uri = _image_to_base64(image_path, max_size=512)
     check_prompt = (
         "You are a quality checker for AI-generated manga/slide images. "
         "Evaluate this image against the intended content below. "
@@ -262,15 +118,16 @@ def _quality_check(image_path, prompt, api_key, base_url, model):
 
     url = f"{base_url}/chat/completions"
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=120)
+        r = _SESSION.post(url, headers=headers, data=_json_body(payload),
+                          timeout=120)
         if r.status_code != 200:
-            print(f"  QC: HTTP {r.status_code}, skipping check")
+            log.warning("  QC: HTTP %d, skipping check", r.status_code)
             return True, "check unavailable"
 
-        resp = r.json()
+        resp = _json_response(r)
         text = resp.get("choices", [{}])[0].get("message", {}).get("content", "")
         text = text.strip()
-        print(f"  QC: {text[:100]}")
+        log.info("  QC: %s", text[:100])
 
         if text.upper().startswith("PASS"):
             return True, text
@@ -280,14 +137,17 @@ def _quality_check(image_path, prompt, api_key, base_url, model):
         else:
             return True, text
     except Exception as e:
-        print(f"  QC error: {e}, skipping")
+        log.warning("  QC error: %s, skipping", e)
         return True, str(e)
 
 
-def _refine_image(image_path, prompt, reason, output,
+def _refine_image(flawed_uri, prompt, reason, output,
                   reference_data_uri, api_key, base_url, model):
-    """Regenerate an image using the flawed version as context."""
-    flawed_uri = _image_to_base64(image_path, max_size=512)
+    """Regenerate an image using the flawed version as context.
+
+    flawed_uri is the data URI already sent for the quality check. Returns
+    the refined image bytes (also written to output), or None on failure.
+    """
     refine_prompt = (
         f"The previous attempt had issues: {reason}. "
         f"Please regenerate and fix these problems. "
@@ -318,55 +178,153 @@ def _refine_image(image_path, prompt, reason, output,
 
     url = f"{base_url}/chat/completions"
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=300)
+        r = _SESSION.post(url, headers=headers, data=_json_body(payload),
+                          timeout=300)
         if r.status_code != 200:
-            print(f"  Refine: HTTP {r.status_code}")
-            return False
+            log.warning("  Refine: HTTP %d", r.status_code)
+            return None
 
-        resp = r.json()
+        resp = _json_response(r)
         text = resp.get("choices", [{}])[0].get("message", {}).get("content", "")
 
-        url_match = re.search(r'!\[.*?\]\((https?://[^\s\)]+)\)', text)
-        if not url_match:
-            url_match = re.search(
-                r'(https?://\S+\.(?:png|jpg|jpeg|webp|gif))',
-                text, re.IGNORECASE,
-            )
-        if not url_match:
-            print(f"  Refine: no image in response")
-            return False
+        img_url = _extract_image_url(text)
+        if not img_url:
+            log.warning("  Refine: no image in response")
+            return None
+
+        # The flawed image stays in place unless the download completes
+        status, size, data = _download_image(img_url, output,
+                                             keep_bytes=True)
+        if size:
+            log.info("  Refine: OK (%s bytes)", f"{size:,}")
+            return data
+        return None
+    except Exception as e:
+        log.warning("  Refine error: %s", e)
+        return None
 
-        img_url = url_match.group(1)
-        img_resp = requests.get(img_url, timeout=60)
-        if img_resp.status_code == 200 and len(img_resp.content) > 1000:
-            with open(output, "wb") as f:
-                f.write(img_resp.content)
-            print(f"  Refine: OK ({len(img_resp.content):,} bytes)")
+
+def _download_image(img_url, output, keep_bytes=False):
+    """Stream an image URL to output.
+
+    Returns (status_code, size, data). size is 0 when the response is not
+    a usable image (non-200 or under 1000 bytes); Content-Length is checked
+    first so such responses are rejected without reading the body. The
+    body is written to output + ".part" and renamed into place only once
+    complete, so an existing output is never left truncated. With
+    keep_bytes, data also holds the body so callers need not read the
+    file back; otherwise it is None.
+    """
+    part = output + ".part"
+    data = None
+    with _SESSION.get(img_url, timeout=60, stream=True) as img_resp:
+        length = img_resp.headers.get("Content-Length")
+        if (img_resp.status_code != 200
+                or (length is not None and int(length) < 1000)):
+            return img_resp.status_code, 0, None
+        img_resp.raw.decode_content = True
+        try:
+            with open(part, "wb") as f:
+                if keep_bytes:
+                    buf = io.BytesIO()
+                    for chunk in iter(
+                            lambda: img_resp.raw.read(64 * 1024), b""):
+                        f.write(chunk)
+                        buf.write(chunk)
+                    data = buf.getvalue()
+                else:
+                    shutil.copyfileobj(img_resp.raw, f, 64 * 1024)
+                size = f.tell()
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+    if size < 1000:
+        os.remove(part)
+        return img_resp.status_code, 0, None
+    os.replace(part, output)
+    return img_resp.status_code, size, data
+
+
+def _review_loop(data, prompt, output, ref_data_uri, api_key, base_url,
+                 model, max_refine):
+    """Quality-check image bytes and refine up to max_refine times.
+
+    The image is encoded once per round and reused by both the check and
+    the refine request. Returns True if the final image passed QC.
+    """
+    image_uri = _bytes_to_base64_resized(data, 512, Image.LANCZOS)
+    for qc_round in range(max_refine):
+        passed, reason = _quality_check(
+            image_uri, prompt, api_key, base_url, model
+        )
+        if passed:
+            log.info("  QC passed")
             return True
+        log.warning("  QC failed (%d/%d): %s",
+                    qc_round + 1, max_refine, reason)
+        refined = _refine_image(
+            image_uri, prompt, reason, output,
+            ref_data_uri, api_key, base_url, model,
+        )
+        if refined is None:
+            log.warning("  Refine failed, keeping current")
+            return False
+        image_uri = _bytes_to_base64_resized(refined, 512, Image.LANCZOS)
+    log.warning("  Max refine attempts reached, keeping best")
+    return False
+
+
+def review_slide(prompt, output, reference_data_uri=None, max_refine=2,
+                 api_key=None, base_url=None, model=None):
+    """Quality-check an already generated slide and refine it if needed.
+
+    The same check generate_slide(quality_check=True) runs inline, split
+    out so callers can review one slide while others are still being
+    generated. The best image is always kept at output.
+
+    Returns True if the final image passed QC.
+    """
+    api_key = api_key or os.getenv("ANTHROPIC_AUTH_TOKEN")
+    if not api_key:
+        log.error("Error: No API key. Set ANTHROPIC_AUTH_TOKEN.")
         return False
-    except Exception as e:
-        print(f"  Refine error: {e}")
-        return False
+    base_url = base_url or os.getenv("LUCKYAPI_BASE_URL", "https://luckyapi.chat/v1")
+    model = model or os.getenv("LUCKYAPI_MODEL", "(按次)gemini-3-pro-image-preview")
+
+    with open(output, "rb") as f:
+        data = f.read()
+    return _review_loop(data, prompt, output, reference_data_uri,
+                        api_key, base_url, model, max_refine)
 
 
 def generate_slide(prompt, output, retries=3, api_key=None,
                    base_url=None, model=None, reference_images=None,
                    reference_labels=None, quality_check=False,
-                   max_refine=2):
+                   max_refine=2, reference_data_uri=None,
+                   max_sheet_kb=512):
     """Generate a slide image and save to output path.
 
     If quality_check=True, evaluates the generated image and refines
     up to max_refine times if serious flaws are detected.
 
+    reference_data_uri: Pre-built sheet from build_reference_sheet();
+        when given, reference_images/reference_labels are not re-encoded.
+    max_sheet_kb: Size cap for a reference sheet built here; see
+        build_reference_sheet().
+
     Returns True on success, False on failure.
     """
-    if os.path.exists(output) and os.path.getsize(output) > 1000:
-        print(f"  [SKIP] {output} already exists")
-        return True
+    try:
+        if os.stat(output).st_size > 1000:
+            log.info("  [SKIP] %s already exists", output)
+            return True
+    except FileNotFoundError:
+        pass
 
     api_key = api_key or os.getenv("ANTHROPIC_AUTH_TOKEN")
     if not api_key:
-        print("Error: No API key. Set ANTHROPIC_AUTH_TOKEN.")
+        log.error("Error: No API key. Set ANTHROPIC_AUTH_TOKEN.")
         return False
 
     base_url = base_url or os.getenv("LUCKYAPI_BASE_URL", "https://luckyapi.chat/v1")
@@ -379,17 +337,16 @@ def generate_slide(prompt, output, retries=3, api_key=None,
     }
 
     # Build content: concatenated reference sheet + text prompt
-    if reference_images:
-        ref_data_uri = _concatenate_reference_images(
-            reference_images, labels=reference_labels
+    ref_data_uri = reference_data_uri
+    if ref_data_uri is None and reference_images:
+        ref_data_uri = build_reference_sheet(
+            reference_images, reference_labels, max_sheet_kb
         )
-        if ref_data_uri:
-            msg_content = [
-                {"type": "image_url", "image_url": {"url": ref_data_uri}},
-                {"type": "text", "text": prompt},
-            ]
-        else:
-            msg_content = prompt
+    if ref_data_uri:
+        msg_content = [
+            {"type": "image_url", "image_url": {"url": ref_data_uri}},
+            {"type": "text", "text": prompt},
+        ]
     else:
         msg_content = prompt
 
@@ -399,81 +356,90 @@ def generate_slide(prompt, output, retries=3, api_key=None,
         "modalities": ["image", "text"],
     }
 
-    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    # Serialized once; the same body is re-sent on every retry
+    body = _json_body(payload)
+
+    _ensure_dir(os.path.dirname(output))
 
     for attempt in range(1, retries + 1):
         try:
-            print(f"  Attempt {attempt}/{retries}...")
-            r = requests.post(url, headers=headers, json=payload, timeout=300)
+            log.info("  Attempt %d/%d...", attempt, retries)
+            r = _SESSION.post(url, headers=headers, data=body, timeout=300)
             if r.status_code != 200:
-                print(f"  HTTP {r.status_code}, retrying...")
-                time.sleep(5)
+                if not _is_retryable(r.status_code):
+                    log.error("  HTTP %d, not retrying: %s",
+                              r.status_code, r.text[:200])
+                    return False
+                log.warning("  HTTP %d, retrying...", r.status_code)
+                _retry_wait(attempt, retries, r)
                 continue
 
-            resp = r.json()
+            resp = _json_response(r)
             msg = resp.get("choices", [{}])[0].get("message", {})
             content = msg.get("content", "")
 
-            # Extract image URL from markdown ![...](url) or bare URL
-            url_match = re.search(r'!\[.*?\]\((https?://[^\s\)]+)\)', content)
-            if not url_match:
-                url_match = re.search(
-                    r'(https?://\S+\.(?:png|jpg|jpeg|webp|gif))',
-                    content, re.IGNORECASE,
-                )
-            if not url_match:
-                print(f"  No image URL in response, retrying...")
-                time.sleep(3)
+            img_url = _extract_image_url(content)
+            if not img_url:
+                log.warning("  No image URL in response, retrying...")
+                _retry_wait(attempt, retries, delay=_NO_IMAGE_DELAY)
                 continue
 
-            img_url = url_match.group(1)
-            img_resp = requests.get(img_url, timeout=60)
-            if img_resp.status_code == 200 and len(img_resp.content) > 1000:
-                with open(output, "wb") as f:
-                    f.write(img_resp.content)
-                print(f"  OK ({len(img_resp.content):,} bytes) -> {output}")
+            status, size, data = _download_image(
+                img_url, output, keep_bytes=quality_check
+            )
+            if size:
+                log.info("  OK (%s bytes) -> %s", f"{size:,}", output)
 
-                # Quality check + refine loop
                 if quality_check:
-                    ref_data_uri = None
-                    if reference_images:
-                        ref_data_uri = _concatenate_reference_images(
-                            reference_images, labels=reference_labels
-                        )
-                    for qc_round in range(max_refine):
-                        passed, reason = _quality_check(
-                            output, prompt, api_key, base_url, model
-                        )
-                        if passed:
-                            print(f"  QC passed")
-                            break
-                        print(f"  QC failed ({qc_round+1}/{max_refine}): "
-                              f"{reason}")
-                        refined = _refine_image(
-                            output, prompt, reason, output,
-                            ref_data_uri, api_key, base_url, model,
-                        )
-                        if not refined:
-                            print(f"  Refine failed, keeping current")
-                            break
-                    else:
-                        print(f"  Max refine attempts reached, keeping best")
+                    _review_loop(data, prompt, output, ref_data_uri,
+                                 api_key, base_url, model, max_refine)
 
                 return True
             else:
-                print(f"  Download failed: HTTP {img_resp.status_code}")
-                time.sleep(3)
+                log.warning("  Download failed: HTTP %d", status)
+                _retry_wait(attempt, retries)
         except requests.exceptions.Timeout:
-            print(f"  Timeout, retrying...")
-            time.sleep(5)
+            log.warning("  Timeout, retrying...")
+            _retry_wait(attempt, retries)
         except Exception as e:
-            print(f"  Error: {e}")
-            time.sleep(3)
+            log.warning("  Error: %s", e)
+            _retry_wait(attempt, retries)
 
-    print(f"  FAILED after {retries} attempts")
+    log.error("  FAILED after %d attempts", retries)
     return False
 
 
+def generate_slides_batch(prompts, outputs, concurrency=4,
+                          reference_images=None, reference_labels=None,
+                          **kwargs):
+    """Generate several slides concurrently.
+
+    Each slide still runs the blocking generate_slide() flow, but up to
+    `concurrency` of them are in flight at once on the shared session, so
+    wall time is bounded by the slowest batch rather than the sum of all
+    calls. The reference sheet is encoded once for the whole batch. Extra
+    keyword arguments are passed through to generate_slide().
+
+    Returns a list of booleans in the same order as outputs.
+    """
+    if len(prompts) != len(outputs):
+        raise ValueError("prompts and outputs must have the same length")
+    if not prompts:
+        return []
+
+    if kwargs.get("reference_data_uri") is None and reference_images:
+        kwargs["reference_data_uri"] = build_reference_sheet(
+            reference_images, reference_labels,
+            kwargs.get("max_sheet_kb", 512),
+        )
+
+    workers = max(1, min(concurrency, len(prompts)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(generate_slide, prompt, output, **kwargs)
+                   for prompt, output in zip(prompts, outputs)]
+        return [f.result() for f in futures]
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate a slide image via LuckyAPI")
     parser.add_argument("prompt", help="Slide description")
@@ -482,7 +448,11 @@ def main():
     parser.add_argument("--style", default="", help="Style prefix to prepend to prompt")
     parser.add_argument("--reference-images", nargs="*", default=None,
                         help="Reference image paths for visual consistency")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Only report warnings and errors")
     args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format="%(message)s", stream=sys.stdout)
 
     prompt = args.prompt
     if args.style:
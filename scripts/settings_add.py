@@ -24,16 +24,20 @@ import json
 import os
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _settings_common import _write_atomic
+
 
 def add_setting(base_dir, category, name, description, images):
     settings_file = os.path.join(base_dir, "settings", "settings.json")
 
-    if not os.path.exists(settings_file):
+    try:
+        with open(settings_file, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
         print(f"Error: {settings_file} not found. Run settings_init.py first.")
         return False
-
-    with open(settings_file) as f:
-        settings = json.load(f)
+    settings = json.loads(raw)
 
     if category not in settings:
         settings[category] = {}
@@ -59,8 +63,12 @@ def add_setting(base_dir, category, name, description, images):
                 entry["images"].append(img)
         print(f"  Updated {category}/{name}")
 
-    with open(settings_file, "w") as f:
-        json.dump(settings, f, indent=2, ensure_ascii=False)
+    new_raw = json.dumps(settings, indent=2, ensure_ascii=False)
+    new_raw = new_raw.encode("utf-8")
+    if new_raw == raw:
+        print(f"  No changes to {settings_file}")
+        return True
+    _write_atomic(settings_file, new_raw)
     print(f"  Saved {settings_file}")
     return True
 
@@ -16,6 +16,10 @@ import argparse
 import json
 import os
 import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _settings_common import _write_atomic
 
 CATEGORIES = ["art_style", "characters", "world", "props"]
 
@@ -31,20 +35,22 @@ DEFAULT_SETTINGS = {
 
 
 def init_settings(base_dir="."):
-    settings_dir = os.path.join(base_dir, "settings")
-    settings_file = os.path.join(settings_dir, "settings.json")
+    settings_dir = Path(base_dir) / "settings"
+    settings_file = settings_dir / "settings.json"
 
-    if os.path.exists(settings_file):
+    if settings_file.exists():
         print(f"Settings already exist at {settings_file}")
         return True
 
+    # Parent chain once, then one mkdir per category
+    settings_dir.mkdir(parents=True, exist_ok=True)
     for cat in CATEGORIES:
-        cat_dir = os.path.join(settings_dir, cat)
-        os.makedirs(cat_dir, exist_ok=True)
+        cat_dir = settings_dir / cat
+        cat_dir.mkdir(exist_ok=True)
         print(f"  Created {cat_dir}/")
 
-    with open(settings_file, "w") as f:
-        json.dump(DEFAULT_SETTINGS, f, indent=2)
+    _write_atomic(settings_file,
+                  json.dumps(DEFAULT_SETTINGS, indent=2).encode("utf-8"))
     print(f"  Created {settings_file}")
 
     print("Settings initialized.")
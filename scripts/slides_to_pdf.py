@@ -17,6 +17,7 @@ Usage:
 """
 
 import argparse
+import os
 import sys
 from pathlib import Path
 from typing import List
@@ -71,6 +72,108 @@ def get_image_files(paths: List[str]) -> List[Path]:
     return image_files
 
 
+def _load_rgb(img_path: Path) -> Image.Image:
+    """
+    Open an image and convert it to RGB for PDF output.
+    
+    Transparent and palette images are flattened onto a white background
+    (PDF doesn't support RGBA).
+    """
+    img = Image.open(img_path)
+    if img.mode in ('RGBA', 'P'):
+        # Create white background
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+class PdfAppender:
+    """
+    Build a PDF one page at a time, as slide images become available.
+    
+    Only the current page is held in memory. Pages are written to
+    "<output>.part" and moved into place by close(), so an interrupted or
+    failed run never leaves a partial PDF at output_path.
+    """
+    
+    def __init__(self, output_path: Path, dpi: int = 150,
+                 verbose: bool = False):
+        self.output_path = Path(output_path)
+        self.part_path = self.output_path.with_name(
+            self.output_path.name + ".part"
+        )
+        self.dpi = dpi
+        self.verbose = verbose
+        self.count = 0
+        self.failed = False
+    
+    def add(self, img_path: Path) -> bool:
+        """
+        Append one image as the next page.
+        
+        Returns:
+            True if the page was written, False otherwise
+        """
+        try:
+            img = _load_rgb(img_path)
+        except Exception as e:
+            print(f"Error loading {img_path}: {e}")
+            self.failed = True
+            return False
+        
+        try:
+            if self.count == 0:
+                self.part_path.parent.mkdir(parents=True, exist_ok=True)
+            img.save(
+                self.part_path,
+                "PDF",
+                resolution=self.dpi,
+                append=self.count > 0
+            )
+        except Exception as e:
+            print(f"Error adding {img_path} to PDF: {e}")
+            self.failed = True
+            return False
+        finally:
+            img.close()
+        
+        self.count += 1
+        if self.verbose:
+            print(f"  [{self.count}] Added: {img_path.name} ({img.size[0]}x{img.size[1]})")
+        return True
+    
+    def close(self) -> bool:
+        """
+        Finish the PDF and move it to output_path.
+        
+        Returns:
+            True if a complete PDF was written, False if no pages were
+            added or any page failed (the partial file is removed)
+        """
+        if self.count == 0 or self.failed:
+            if self.part_path.exists():
+                self.part_path.unlink()
+            if self.count == 0 and not self.failed:
+                print("Error: No image files found")
+            return False
+        
+        os.replace(self.part_path, self.output_path)
+        if self.verbose:
+            print(f"\n✓ PDF created: {self.output_path}")
+            print(f"  Total slides: {self.count}")
+            file_size = self.output_path.stat().st_size
+            if file_size > 1024 * 1024:
+                print(f"  File size: {file_size / (1024 * 1024):.1f} MB")
+            else:
+                print(f"  File size: {file_size / 1024:.1f} KB")
+        return True
+
+
 def combine_images_to_pdf(image_paths: List[Path], output_path: Path, 
                          dpi: int = 150, verbose: bool = False) -> bool:
     """
@@ -96,18 +199,7 @@ def combine_images_to_pdf(image_paths: List[Path], output_path: Path,
     images = []
     for i, img_path in enumerate(image_paths):
         try:
-            img = Image.open(img_path)
-            # Convert to RGB if necessary (PDF doesn't support RGBA)
-            if img.mode in ('RGBA', 'P'):
-                # Create white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
+            img = _load_rgb(img_path)
             images.append(img)
             
             if verbose: